@@ -3,82 +3,195 @@ Dashboard Streamlit para analise de documentos anti-fraude com Azure AI.
 """
 
 import streamlit as st
-import json
-import tempfile
-import os
+import asyncio
+import concurrent.futures
+import orjson
+import threading
 from src.document_analyzer import DocumentAnalyzer
 
 
-def main():
-    st.set_page_config(
-        page_title="Analise Anti-fraude - Azure AI",
-        page_icon="\ud83d\udd0d",
-        layout="wide",
-    )
+@st.cache_resource
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    # Os clientes async ficam presos ao loop em que abriram conexoes, entao o
+    # loop vive junto com o DocumentAnalyzer cacheado, em uma thread propria.
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
 
-    st.title("Analise de Documentos Anti-fraude com Azure AI")
-    st.markdown("Sistema de deteccao de fraude em documentos usando Azure Document Intelligence e OpenAI.")
 
-    uploaded_file = st.file_uploader(
-        "Faca upload do documento para analise",
-        type=["pdf", "png", "jpg", "jpeg", "tiff"],
-    )
+@st.cache_resource
+def get_analyzer() -> DocumentAnalyzer:
+    return DocumentAnalyzer()
 
-    if uploaded_file and st.button("Analisar Documento", type="primary"):
-        try:
-            analyzer = DocumentAnalyzer()
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp:
-                tmp.write(uploaded_file.getvalue())
-                tmp_path = tmp.name
+def _submit(coro) -> concurrent.futures.Future:
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop())
+
+
+def _run(coro):
+    return _submit(coro).result()
+
+
+def _analyze_many(analyzer: DocumentAnalyzer, documents: list[bytes], names: list[str]) -> list[dict]:
+    # O callback roda na thread do event loop, onde elementos do Streamlit nao
+    # podem ser atualizados; a barra e redesenhada aqui, na thread do script.
+    completed = [0]
+
+    def _on_progress(done: int, total: int):
+        completed[0] = done
+
+    progress = st.progress(0.0, text="Analisando documentos...")
+    future = _submit(analyzer.analyze_documents(documents, names, on_progress=_on_progress))
+    while not concurrent.futures.wait([future], timeout=0.2).done:
+        progress.progress(completed[0] / len(documents), text=f"{completed[0]}/{len(documents)} documentos analisados")
+    progress.empty()
+    return future.result()
+
+
+def _iter_async(agen):
+    # __anext__ e chamado dentro do loop, para que o gerador fique registrado
+    # nele; se o stream for abandonado (rerun), aclose tambem roda no loop.
+    async def _next():
+        return await agen.__anext__()
+
+    try:
+        while True:
+            try:
+                yield _run(_next())
+            except StopAsyncIteration:
+                return
+    finally:
+        _run(agen.aclose())
+
+
+def _analyze_single_streaming(analyzer: DocumentAnalyzer, uploaded_file):
+    file_bytes = uploaded_file.getvalue()
+    with st.spinner("Analisando documento..."):
+        # Uploads identicos reaproveitam o cache por hash de conteudo do analyzer.
+        doc = _run(analyzer.prepare_documents([file_bytes], [uploaded_file.name]))[0]
+
+    result = analyzer.build_reports([doc], {})[0]
+    stream = analyzer._analyze_fraud_patterns_stream(doc["extracted_data"], doc["validation"])
+    _render_result(result, "0", _iter_async(stream))
+
 
-            with st.spinner("Analisando documento..."):
-                result = analyzer.analyze_document(tmp_path)
+def _render_result(result: dict, key: str, analysis_stream=None):
+    col1, col2, col3 = st.columns(3)
 
-            os.unlink(tmp_path)
+    with col1:
+        score = result["risk_score"]
+        color = "green" if score <= 20 else "orange" if score <= 50 else "red"
+        st.metric("Score de Risco", f"{score}/100")
 
-            col1, col2, col3 = st.columns(3)
+    with col2:
+        st.metric("Nivel de Risco", result["risk_level"])
 
-            with col1:
-                score = result["risk_score"]
-                color = "green" if score <= 20 else "orange" if score <= 50 else "red"
-                st.metric("Score de Risco", f"{score}/100")
+    with col3:
+        valid = len(result["validation"]["valid_fields"])
+        invalid = len(result["validation"]["invalid_fields"])
+        st.metric("Campos Validos/Invalidos", f"{valid}/{invalid}")
 
-            with col2:
-                st.metric("Nivel de Risco", result["risk_level"])
+    st.subheader("Detalhes da Validacao")
 
-            with col3:
-                valid = len(result["validation"]["valid_fields"])
-                invalid = len(result["validation"]["invalid_fields"])
-                st.metric("Campos Validos/Invalidos", f"{valid}/{invalid}")
+    if result["validation"]["valid_fields"]:
+        st.success("Campos validos: " + ", ".join(result["validation"]["valid_fields"]))
 
-            st.subheader("Detalhes da Validacao")
+    if result["validation"]["invalid_fields"]:
+        st.error("Campos invalidos: " + ", ".join(result["validation"]["invalid_fields"]))
 
-            if result["validation"]["valid_fields"]:
-                st.success("Campos validos: " + ", ".join(result["validation"]["valid_fields"]))
+    if result["validation"]["warnings"]:
+        st.warning("Alertas: " + ", ".join(result["validation"]["warnings"]))
 
-            if result["validation"]["invalid_fields"]:
-                st.error("Campos invalidos: " + ", ".join(result["validation"]["invalid_fields"]))
+    st.subheader("Analise de Fraude")
+    if analysis_stream is not None:
+        result["fraud_analysis"]["analysis"] = st.write_stream(analysis_stream)
+    else:
+        st.write(result["fraud_analysis"].get("analysis", "Analise nao disponivel"))
 
-            if result["validation"]["warnings"]:
-                st.warning("Alertas: " + ", ".join(result["validation"]["warnings"]))
+    st.subheader("Dados Extraidos")
+    st.json(result["extracted_data"])
 
-            st.subheader("Analise de Fraude")
-            st.write(result["fraud_analysis"].get("analysis", "Analise nao disponivel"))
+    st.download_button(
+        label="Exportar Relatorio (JSON)",
+        data=orjson.dumps(result, option=orjson.OPT_INDENT_2),
+        file_name=f"relatorio_antifraude_{key}.json",
+        mime="application/json",
+        key=f"download_{key}",
+    )
+
+
+def _render_results(results: list[dict], names: list[str]):
+    if len(results) == 1:
+        _render_result(results[0], "0")
+        return
+
+    for index, (name, result) in enumerate(zip(names, results)):
+        with st.expander(f"{name} - {result['risk_level']}"):
+            _render_result(result, str(index))
+
+
+def main():
+    st.set_page_config(
+        page_title="Analise Anti-fraude - Azure AI",
+        page_icon="\ud83d\udd0d",
+        layout="wide",
+    )
 
-            st.subheader("Dados Extraidos")
-            st.json(result["extracted_data"])
+    st.title("Analise de Documentos Anti-fraude com Azure AI")
+    st.markdown("Sistema de deteccao de fraude em documentos usando Azure Document Intelligence e OpenAI.")
+
+    uploaded_files = st.file_uploader(
+        "Faca upload dos documentos para analise",
+        type=["pdf", "png", "jpg", "jpeg", "tiff"],
+        accept_multiple_files=True,
+    )
+
+    analyze_clicked = batch_clicked = False
+    if uploaded_files:
+        col_analyze, col_batch = st.columns(2)
+        analyze_clicked = col_analyze.button("Analisar Documento", type="primary")
+        batch_clicked = col_batch.button("Enviar para Lote")
 
-            st.download_button(
-                label="Exportar Relatorio (JSON)",
-                data=json.dumps(result, ensure_ascii=False, indent=2),
-                file_name="relatorio_antifraude.json",
-                mime="application/json",
-            )
+    if analyze_clicked and len(uploaded_files) == 1:
+        try:
+            _analyze_single_streaming(get_analyzer(), uploaded_files[0])
+        except Exception as e:
+            st.error(f"Erro na analise: {e}")
+
+    elif analyze_clicked or batch_clicked:
+        try:
+            analyzer = get_analyzer()
+            names = [uploaded_file.name for uploaded_file in uploaded_files]
+            documents = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+
+            if batch_clicked:
+                with st.spinner("Enviando documentos para analise em lote..."):
+                    docs = _run(analyzer.prepare_documents(documents, names))
+                    batch_id = _run(analyzer.submit_fraud_batch(docs))
+                st.session_state["fraud_batch"] = {"id": batch_id, "docs": docs, "names": names}
+            else:
+                _render_results(_analyze_many(analyzer, documents, names), names)
 
         except Exception as e:
             st.error(f"Erro na analise: {e}")
 
+    fraud_batch = st.session_state.get("fraud_batch")
+    if fraud_batch:
+        st.info(f"Lote {fraud_batch['id']} enviado para analise (ate 24h).")
+        if st.button("Verificar Lote"):
+            try:
+                analyzer = get_analyzer()
+                analyses = _run(analyzer.poll_batch(fraud_batch["id"]))
+                if analyses:
+                    _render_results(
+                        analyzer.build_reports(fraud_batch["docs"], analyses),
+                        fraud_batch["names"],
+                    )
+                else:
+                    st.info("Lote ainda em processamento.")
+            except Exception as e:
+                st.error(f"Erro na consulta do lote: {e}")
+
 
 if __name__ == "__main__":
     main()
@@ -4,89 +4,783 @@ Utiliza Azure Document Intelligence para extracao e Azure OpenAI para analise.
 """
 
 import os
-import json
-from datetime import datetime
-from typing import Optional
+import asyncio
+import hashlib
+import re
+import threading
+import uuid
+from collections import OrderedDict, deque
+from operator import mul
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Callable, Optional, Union
+from urllib.parse import unquote, urlparse
+import numpy as np
+import orjson
 from dotenv import load_dotenv
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 try:
-    from azure.ai.documentintelligence import DocumentIntelligenceClient
-    from azure.core.credentials import AzureKeyCredential
+    import aiofiles
 except ImportError:
-    DocumentIntelligenceClient = None
-    AzureKeyCredential = None
+    aiofiles = None
+
+# Os SDKs do Azure, do OpenAI e o httpx sao importados sob demanda, apenas
+# quando as credenciais correspondentes existem, para nao pesar no
+# carregamento do modulo a cada rerun do Streamlit.
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
 
 try:
-    from openai import AzureOpenAI
+    import diskcache
 except ImportError:
-    AzureOpenAI = None
+    diskcache = None
 
 load_dotenv()
 
+# Caminho do arquivo, conteudo em memoria ou arquivo ja aberto em modo binario.
+DocumentSource = Union[str, bytes, BinaryIO]
+
+# Classifica a chave do campo em um unico match, com a mesma prioridade
+# cpf > cnpj > data/date da validacao original (grupo 1, 2 ou 3).
+_FIELD_KIND_RE = re.compile(
+    r"^(?:(?=.*(cpf))|(?=.*(cnpj))|(?=.*(dat[ae])))", re.IGNORECASE | re.DOTALL
+)
+_CPF, _CNPJ, _DATE = 1, 2, 3
+
+# Instrucoes fixas ficam na mensagem de sistema, antes dos dados do documento,
+# para que o prefixo do prompt seja identico entre chamadas (prompt caching).
+_FRAUD_SYSTEM_PROMPT = """Analise os dados extraidos de um documento e identifique possiveis indicadores de fraude.
+
+Forneca uma analise estruturada com:
+1. Indicadores de fraude encontrados
+2. Nivel de suspeita (baixo, medio, alto)
+3. Recomendacoes"""
+
+_MAX_FIELD_CHARS = 200
+
+_MEMORY_CACHE_SIZE = 256
+_DISK_CACHE_TTL = 86400
+
+_OPENAI_BACKOFF = wait_exponential_jitter(initial=1, max=30)
+
+_NON_DIGIT = str.maketrans("", "", "".join(chr(c) for c in range(128) if not chr(c).isdigit()))
+
+# dd/mm/aaaa, dd-mm-aaaa e mm/dd/aaaa compartilham o mesmo formato; aaaa-mm-dd a parte.
+_DATE_RE = re.compile(
+    r"\s*(?:(?P<a>[0-9]{1,2})(?P<sep>[/-])(?P<b>[0-9]{1,2})(?P=sep)(?P<y>[0-9]{4})"
+    r"|(?P<iso_y>[0-9]{4})-(?P<iso_m>[0-9]{1,2})-(?P<iso_d>[0-9]{1,2}))\s*"
+)
+
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _days_in_month(year: int, month: int) -> int:
+    """Quantidade de dias do mes, considerando anos bissextos."""
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DAYS_IN_MONTH[month]
+
+
+_CPF_WEIGHTS = np.array(
+    [[10, 9, 8, 7, 6, 5, 4, 3, 2, 0], [11, 10, 9, 8, 7, 6, 5, 4, 3, 2]], dtype=np.int32
+).T
+
+
+def _cpf_batch_ok(digits: np.ndarray) -> np.ndarray:
+    """Confere os digitos verificadores de uma matriz (n, 11) de CPFs de uma so vez."""
+    totals = digits[:, :10].astype(np.int32) @ _CPF_WEIGHTS
+    checks = (totals * 10 % 11) % 10
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return (checks == digits[:, 9:]).all(axis=1) & ~repeated
+
+
+_CNPJ_W1_TUPLE = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_CNPJ_W2_TUPLE = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_CNPJ_WEIGHTS = np.array([_CNPJ_W1_TUPLE + (0,), _CNPJ_W2_TUPLE], dtype=np.int32).T
+
+
+def _cnpj_batch_ok(digits: np.ndarray) -> np.ndarray:
+    """Confere os digitos verificadores de uma matriz (n, 14) de CNPJs de uma so vez."""
+    remainders = (digits[:, :13].astype(np.int32) @ _CNPJ_WEIGHTS) % 11
+    checks = np.where(remainders < 2, 0, 11 - remainders)
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return (checks == digits[:, 12:]).all(axis=1) & ~repeated
+
+
+def _is_retryable_openai_error(exc: BaseException) -> bool:
+    """429 e falhas de conexao do Azure OpenAI; o SDK ja esta carregado quando ha cliente."""
+    from openai import APIConnectionError, RateLimitError
+
+    return isinstance(exc, (RateLimitError, APIConnectionError))
+
+
+def _wait_retry_after(retry_state) -> float:
+    """Respeita o retry-after enviado pelo Azure OpenAI; sem ele, backoff exponencial."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None:
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return min(float(headers["retry-after-ms"]) / 1000, 60.0)
+            if "retry-after" in headers:
+                return min(float(headers["retry-after"]), 60.0)
+        except ValueError:
+            pass
+    return _OPENAI_BACKOFF(retry_state)
+
+
+class UringReader:
+    """Le arquivos inteiros via io_uring usando um pool de buffers registrados no kernel."""
+
+    def __init__(self, chunk_size: int = 1 << 20, queue_depth: int = 8):
+        self.chunk_size = chunk_size
+        self._ring = None
+        self._cqe = liburing.Cqe()
+        self._buffers = [bytearray(chunk_size) for _ in range(queue_depth)]
+        self._iovecs = liburing.Iovec(self._buffers)
+
+        ring = liburing.Ring()
+        liburing.io_uring_queue_init(queue_depth, ring)
+        try:
+            liburing.io_uring_register_buffers(ring, self._iovecs)
+        except OSError:
+            liburing.io_uring_queue_exit(ring)
+            raise
+        self._ring = ring
+
+    def read(self, path: str) -> bytes:
+        """Le o arquivo em blocos de chunk_size, com ate queue_depth leituras em paralelo."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            data = bytearray(size)
+            pending = deque(
+                (offset, min(self.chunk_size, size - offset))
+                for offset in range(0, size, self.chunk_size)
+            )
+            free = list(range(len(self._buffers)))
+            in_flight = {}
+
+            while pending or in_flight:
+                while pending and free:
+                    index = free.pop()
+                    offset, length = pending.popleft()
+                    sqe = liburing.io_uring_get_sqe(self._ring)
+                    liburing.io_uring_prep_read_fixed(sqe, fd, self._buffers[index], index, offset)
+                    liburing.io_uring_sqe_set_data64(sqe, index)
+                    in_flight[index] = (offset, length)
+                liburing.io_uring_submit(self._ring)
+
+                liburing.io_uring_wait_cqe(self._ring, self._cqe)
+                entry = self._cqe[0]
+                index, res = entry.user_data, entry.res
+                liburing.io_uring_cq_advance(self._ring, 1)
+
+                offset, length = in_flight.pop(index)
+                free.append(index)
+                if res < 0:
+                    raise OSError(-res, os.strerror(-res), path)
+                if res == 0:
+                    raise OSError(f"Arquivo truncado durante a leitura: {path}")
+
+                read = min(res, length)
+                data[offset:offset + read] = self._buffers[index][:read]
+                if read < length:
+                    pending.appendleft((offset + read, length - read))
+        finally:
+            os.close(fd)
+
+        return bytes(data)
+
+    def close(self) -> None:
+        if self._ring is not None:
+            liburing.io_uring_unregister_buffers(self._ring)
+            liburing.io_uring_queue_exit(self._ring)
+            self._ring = None
+
+    def __del__(self):
+        self.close()
+
 
 class DocumentAnalyzer:
     """Analisa documentos para deteccao de fraude usando Azure Document Intelligence."""
 
-    def __init__(self):
+    _BULK_THRESHOLD = 32
+
+    def __init__(self, max_concurrent_requests: int = 32, max_concurrent_documents: Optional[int] = None):
         self.doc_key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
         self.doc_endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
         self.openai_key = os.getenv("AZURE_OPENAI_KEY")
         self.openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         self.openai_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4")
+        self.openai_batch_deployment = os.getenv(
+            "AZURE_OPENAI_BATCH_DEPLOYMENT", self.openai_deployment
+        )
+        self.storage_connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+        self.storage_container = os.getenv("AZURE_STORAGE_CONTAINER", "documentos")
+        self.storage_sas_expiry_hours = float(os.getenv("AZURE_STORAGE_SAS_EXPIRY_HOURS", "24"))
 
         self.doc_client = None
         self.openai_client = None
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self._document_semaphore = asyncio.Semaphore(
+            max_concurrent_documents or int(os.getenv("MAX_CONCURRENT", "16"))
+        )
+        self._use_uring = bool(liburing) and os.getenv("USE_IOURING") == "1"
+        self._uring_readers = threading.local()
 
-        if self.doc_key and self.doc_endpoint and DocumentIntelligenceClient:
-            self.doc_client = DocumentIntelligenceClient(
-                endpoint=self.doc_endpoint,
-                credential=AzureKeyCredential(self.doc_key),
-            )
+        # Cache em dois niveis, por hash do conteudo: LRU em memoria e, com
+        # ANALYSIS_CACHE_DIR definido, diskcache para sobreviver a reinicios.
+        self._memory_cache = OrderedDict()
+        self._disk_cache = None
+        cache_dir = os.getenv("ANALYSIS_CACHE_DIR")
+        if cache_dir and diskcache:
+            self._disk_cache = diskcache.Cache(cache_dir)
 
-        if self.openai_key and self.openai_endpoint and AzureOpenAI:
-            self.openai_client = AzureOpenAI(
-                api_key=self.openai_key,
-                api_version="2024-02-01",
-                azure_endpoint=self.openai_endpoint,
-            )
+        # Pool HTTP/2 do Azure OpenAI (HTTP/1.1 sem o pacote h2): o handshake TLS
+        # e pago uma vez e as requisicoes concorrentes sao multiplexadas.
+        self._http_client = None
+        if self.doc_key and self.doc_endpoint:
+            self.doc_client = self._create_doc_client()
+        if self.openai_key and self.openai_endpoint:
+            self.openai_client = self._create_openai_client()
+
+    def _create_http_pool(self) -> None:
+        import httpx
+
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            http2 = False
+        else:
+            http2 = True
+
+        self._http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+            timeout=httpx.Timeout(300.0, connect=10.0),
+        )
+
+    def _create_doc_client(self):
+        try:
+            from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
+            from azure.core.credentials import AzureKeyCredential
+        except ImportError:
+            return None
+
+        return DocumentIntelligenceClient(
+            endpoint=self.doc_endpoint,
+            credential=AzureKeyCredential(self.doc_key),
+        )
+
+    def _create_openai_client(self):
+        try:
+            from openai import AsyncAzureOpenAI
+        except ImportError:
+            return None
+
+        self._create_http_pool()
+        return AsyncAzureOpenAI(
+            api_key=self.openai_key,
+            api_version="2024-10-21",
+            azure_endpoint=self.openai_endpoint,
+            http_client=self._http_client,
+            max_retries=0,
+        )
 
-    def analyze_document(self, document_path: str) -> dict:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        """Fecha as conexoes HTTP abertas pelos clientes Azure."""
+        if self.doc_client:
+            await self.doc_client.close()
+        if self.openai_client:
+            await self.openai_client.close()
+        if self._http_client:
+            await self._http_client.aclose()
+        if self._disk_cache is not None:
+            self._disk_cache.close()
+
+    async def analyze_document(self, document: DocumentSource, name: Optional[str] = None) -> dict:
         """
         Analisa um documento para extracao de dados e deteccao de fraude.
 
         Args:
-            document_path: Caminho do arquivo do documento
+            document: Caminho do arquivo, bytes ou arquivo binario aberto
+            name: Nome do documento no relatorio (padrao: o caminho)
 
         Returns:
             Dicionario com dados extraidos e analise de fraude
         """
-        extracted_data = self._extract_document_data(document_path)
-        validation_results = self._validate_fields(extracted_data)
-        fraud_analysis = self._analyze_fraud_patterns(extracted_data, validation_results)
+        extracted_data = await self._extract_document_data(document)
+        return await self._build_report(self._document_name(document, name), extracted_data)
+
+    async def analyze_documents(
+        self,
+        documents: list[DocumentSource],
+        names: Optional[list[str]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> list[dict]:
+        """
+        Analisa varios documentos com uma unica requisicao em lote ao Document Intelligence.
+
+        Os arquivos sao enviados ao Azure Blob Storage e processados por
+        begin_analyze_batch_documents. Sem Blob Storage configurado, ou com
+        apenas um documento, cada arquivo segue o fluxo de analyze_document.
+
+        Args:
+            documents: Caminhos, bytes ou arquivos binarios dos documentos
+            names: Nomes dos documentos no relatorio, na mesma ordem
+            on_progress: Chamado com (concluidos, total) a cada relatorio pronto
+
+        Returns:
+            Lista de relatorios na mesma ordem de documents
+        """
+        names = self._document_names(documents, names)
+        if len(documents) <= 1 or not self._batch_enabled():
+            return await self._fan_out(
+                [self.analyze_document(doc, name) for doc, name in zip(documents, names)],
+                on_progress,
+            )
+
+        extracted = await self._extract_batch_data(documents, names)
+        return await self._fan_out(
+            [self._build_report(name, data) for name, data in zip(names, extracted)],
+            on_progress,
+        )
+
+    async def prepare_documents(
+        self, documents: list[DocumentSource], names: Optional[list[str]] = None
+    ) -> list[dict]:
+        """
+        Extrai e valida documentos sem executar a analise de fraude.
+
+        O resultado alimenta submit_fraud_batch, que envia a analise de fraude
+        para a Batch API do Azure OpenAI.
+
+        Args:
+            documents: Caminhos, bytes ou arquivos binarios dos documentos
+            names: Nomes dos documentos no relatorio, na mesma ordem
+
+        Returns:
+            Lista de dicionarios com documento, identificador unico do lote
+            (custom_id), dados extraidos e validacao
+        """
+        names = self._document_names(documents, names)
+        if len(documents) <= 1 or not self._batch_enabled():
+            extracted = await self._fan_out(
+                [self._extract_document_data(doc) for doc in documents]
+            )
+        else:
+            extracted = await self._extract_batch_data(documents, names)
+
+        docs = []
+        for name, data in zip(names, extracted):
+            doc = self._prepare_report(name, data)
+            doc["custom_id"] = uuid.uuid4().hex
+            docs.append(doc)
+        return docs
+
+    async def submit_fraud_batch(self, docs: list[dict]) -> str:
+        """
+        Envia a analise de fraude de varios documentos para a Batch API do Azure OpenAI.
+
+        Args:
+            docs: Documentos retornados por prepare_documents
+
+        Returns:
+            Identificador do lote criado
+        """
+        if not self.openai_client:
+            raise RuntimeError("OpenAI client nao configurado")
+
+        lines = []
+        for doc in docs:
+            lines.append(orjson.dumps({
+                "custom_id": doc["custom_id"],
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.openai_batch_deployment,
+                    "messages": self._build_fraud_messages(doc["extracted_data"], doc["validation"]),
+                    "temperature": 0.1,
+                },
+            }))
 
+        batch_file = await self._call_openai(
+            self.openai_client.files.create,
+            file=("fraud_batch.jsonl", b"\n".join(lines)),
+            purpose="batch",
+        )
+        batch = await self._call_openai(
+            self.openai_client.batches.create,
+            input_file_id=batch_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def poll_batch(self, batch_id: str) -> dict:
+        """
+        Consulta um lote enviado por submit_fraud_batch.
+
+        Args:
+            batch_id: Identificador do lote
+
+        Returns:
+            Dicionario {custom_id: analise}, com {"error": mensagem} nas linhas
+            que falharam; vazio enquanto o lote nao terminar
+        """
+        if not self.openai_client:
+            raise RuntimeError("OpenAI client nao configurado")
+
+        batch = await self._call_openai(self.openai_client.batches.retrieve, batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Lote {batch_id} finalizado com status {batch.status}")
+        if batch.status != "completed":
+            return {}
+        if not batch.output_file_id and not batch.error_file_id:
+            raise RuntimeError(f"Lote {batch_id} concluido sem arquivos de resultado")
+
+        analyses = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self._call_openai(self.openai_client.files.content, file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    analyses[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+                else:
+                    analyses[item["custom_id"]] = {"error": self._batch_line_error(item)}
+        return analyses
+
+    def _batch_line_error(self, item: dict) -> str:
+        response = item.get("response") or {}
+        error = item.get("error") or (response.get("body") or {}).get("error") or {}
+        message = error.get("message") or response.get("status_code") or "erro desconhecido"
+        return f"Falha na analise em lote: {message}"
+
+    def build_reports(self, docs: list[dict], analyses: dict) -> list[dict]:
+        """Monta os relatorios finais a partir dos documentos preparados e das analises do lote."""
+        reports = []
+        for doc in docs:
+            analysis = analyses.get(doc.get("custom_id"))
+            if isinstance(analysis, dict):
+                analysis = analysis["error"]
+            elif analysis:
+                messages = self._build_fraud_messages(doc["extracted_data"], doc["validation"])
+                key = self._fraud_key(self.openai_batch_deployment, messages)
+                payload = orjson.dumps(analysis)
+                self._remember(key, payload)
+                self._persist(key, payload)
+            fraud_analysis = {
+                "analysis": analysis or "Analise nao disponivel",
+                "flags": self._fraud_flags(doc["validation"]),
+            }
+            reports.append(self._finish_report(doc, fraud_analysis))
+        return reports
+
+    async def _cache_get(self, key: str):
+        """Consulta o cache; o diskcache (SQLite) e lido fora do event loop."""
+        if key in self._memory_cache:
+            self._memory_cache.move_to_end(key)
+            return orjson.loads(self._memory_cache[key])
+        if self._disk_cache is not None:
+            payload = await asyncio.to_thread(self._disk_cache.get, key)
+            if payload is not None:
+                self._remember(key, payload)
+                return orjson.loads(payload)
+        return None
+
+    async def _cache_set(self, key: str, value) -> None:
+        """Grava no cache; a escrita no diskcache (SQLite) roda fora do event loop."""
+        payload = orjson.dumps(value)
+        self._remember(key, payload)
+        if self._disk_cache is not None:
+            await asyncio.to_thread(self._persist, key, payload)
+
+    def _persist(self, key: str, payload: bytes) -> None:
+        if self._disk_cache is not None:
+            self._disk_cache.set(key, payload, expire=_DISK_CACHE_TTL)
+
+    def _remember(self, key: str, payload: bytes) -> None:
+        self._memory_cache[key] = payload
+        self._memory_cache.move_to_end(key)
+        if len(self._memory_cache) > _MEMORY_CACHE_SIZE:
+            self._memory_cache.popitem(last=False)
+
+    async def _extraction_key(self, data: bytes) -> str:
+        """Hash do conteudo, calculado fora do event loop (documentos podem ter dezenas de MB)."""
+        digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        return f"extracao:{digest}"
+
+    def _fraud_key(self, deployment: str, messages: list[dict]) -> str:
+        payload = orjson.dumps([deployment, messages])
+        return f"fraude:{hashlib.sha256(payload).hexdigest()}"
+
+    async def _fan_out(
+        self, coros: list, on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> list:
+        """Executa as corrotinas em paralelo, no maximo MAX_CONCURRENT documentos por vez."""
+        done = 0
+
+        async def _one(coro):
+            nonlocal done
+            async with self._document_semaphore:
+                result = await coro
+            done += 1
+            if on_progress:
+                on_progress(done, len(coros))
+            return result
+
+        return list(await asyncio.gather(*(_one(coro) for coro in coros)))
+
+    def _document_name(self, document: DocumentSource, name: Optional[str]) -> str:
+        if name:
+            return name
+        if isinstance(document, str):
+            return document
+        return getattr(document, "name", None) or "documento"
+
+    def _document_names(self, documents: list[DocumentSource], names: Optional[list[str]]) -> list[str]:
+        names = names or [None] * len(documents)
+        return [self._document_name(doc, name) for doc, name in zip(documents, names)]
+
+    def _prepare_report(self, document_name: str, extracted_data: dict) -> dict:
+        return {
+            "document": document_name,
+            "extracted_data": extracted_data,
+            "validation": self._validate_fields(extracted_data),
+        }
+
+    async def _build_report(self, document_name: str, extracted_data: dict) -> dict:
+        """Valida os dados extraidos, analisa fraude e monta o relatorio final."""
+        prepared = self._prepare_report(document_name, extracted_data)
+        fraud_analysis = await self._analyze_fraud_patterns(extracted_data, prepared["validation"])
+        return self._finish_report(prepared, fraud_analysis)
+
+    def _finish_report(self, prepared: dict, fraud_analysis: dict) -> dict:
+        validation_results = prepared["validation"]
         risk_score = self._calculate_risk_score(validation_results, fraud_analysis)
 
         return {
             "timestamp": datetime.now().isoformat(),
-            "document": document_path,
-            "extracted_data": extracted_data,
+            "document": prepared["document"],
+            "extracted_data": prepared["extracted_data"],
             "validation": validation_results,
             "fraud_analysis": fraud_analysis,
             "risk_score": risk_score,
             "risk_level": self._get_risk_level(risk_score),
         }
 
-    def _extract_document_data(self, document_path: str) -> dict:
+    async def _read_document(self, document: DocumentSource) -> bytes:
+        """Le o conteudo do documento sem bloquear o event loop."""
+        if isinstance(document, bytes):
+            return document
+        if not isinstance(document, str):
+            return await asyncio.to_thread(document.read)
+
+        if self._use_uring:
+            try:
+                return await asyncio.to_thread(self._read_with_uring, document)
+            except OSError:
+                if os.path.isfile(document):
+                    self._use_uring = False
+                else:
+                    raise
+
+        if aiofiles:
+            async with aiofiles.open(document, "rb") as f:
+                return await f.read()
+
+        def _read() -> bytes:
+            with open(document, "rb") as f:
+                return f.read()
+
+        return await asyncio.to_thread(_read)
+
+    def _read_with_uring(self, document_path: str) -> bytes:
+        # Cada thread do executor mantem seu proprio ring, sem compartilhar a fila.
+        reader = getattr(self._uring_readers, "reader", None)
+        if reader is None:
+            reader = self._uring_readers.reader = UringReader()
+        return reader.read(document_path)
+
+    async def _extract_document_data(self, document: DocumentSource) -> dict:
         """Extrai dados estruturados do documento usando Azure Document Intelligence."""
         if not self.doc_client:
             return {"error": "Document Intelligence client nao configurado"}
 
-        with open(document_path, "rb") as f:
-            poller = self.doc_client.begin_analyze_document(
-                "prebuilt-document", body=f
+        data = await self._read_document(document)
+        cache_key = await self._extraction_key(data)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        async with self._semaphore:
+            poller = await self.doc_client.begin_analyze_document(
+                "prebuilt-document", body=data
+            )
+            result = await poller.result()
+
+        extracted = self._parse_analyze_result(result)
+        await self._cache_set(cache_key, extracted)
+        return extracted
+
+    def _batch_enabled(self) -> bool:
+        if not (self.doc_client and self.storage_connection_string):
+            return False
+        # O Document Intelligence precisa de uma URL com SAS: ela e gerada com a
+        # AccountKey ou reaproveitada da SharedAccessSignature da connection string.
+        settings = {
+            part.split("=", 1)[0].strip().lower()
+            for part in self.storage_connection_string.split(";")
+            if "=" in part
+        }
+        if not settings & {"accountkey", "sharedaccesssignature"}:
+            return False
+        try:
+            import azure.storage.blob.aio  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    async def _extract_batch_data(self, documents: list[DocumentSource], names: list[str]) -> list[dict]:
+        """Extrai dados de varios documentos; apenas os que nao estao em cache vao para o lote."""
+        contents = await asyncio.gather(*(self._read_document(doc) for doc in documents))
+        keys = await asyncio.gather(*(self._extraction_key(data) for data in contents))
+        extracted = list(await asyncio.gather(*(self._cache_get(key) for key in keys)))
+
+        missing = [index for index, data in enumerate(extracted) if data is None]
+        if missing:
+            results = await self._run_batch_job(
+                [contents[index] for index in missing], [names[index] for index in missing]
             )
-            result = poller.result()
+            for index, data in zip(missing, results):
+                extracted[index] = data
+                if "error" not in data:
+                    await self._cache_set(keys[index], data)
+
+        return extracted
+
+    async def _run_batch_job(self, contents: list[bytes], names: list[str]) -> list[dict]:
+        """Extrai dados de varios documentos em um unico job de analise em lote."""
+        from azure.ai.documentintelligence.models import (
+            AnalyzeBatchDocumentsRequest,
+            AnalyzeResult,
+            AzureBlobContentSource,
+        )
+        from azure.storage.blob import ContainerSasPermissions, generate_container_sas
+        from azure.storage.blob.aio import ContainerClient
+
+        batch_prefix = f"lote-{uuid.uuid4().hex}/"
+        source_prefix = f"{batch_prefix}entrada/"
+        result_prefix = f"{batch_prefix}resultado/"
+
+        container = ContainerClient.from_connection_string(
+            self.storage_connection_string, self.storage_container
+        )
+        blob_index = {
+            f"{source_prefix}{index:04d}{os.path.splitext(name)[1]}": index
+            for index, name in enumerate(names)
+        }
+        extracted = [
+            {"error": "Documento ausente no resultado do lote"} for _ in contents
+        ]
+
+        async def _upload(blob_name: str, index: int) -> None:
+            async with self._semaphore:
+                await container.upload_blob(blob_name, contents[index])
+
+        async def _download(index: int, result_url: str) -> None:
+            async with self._semaphore:
+                download = await container.download_blob(self._blob_name(result_url))
+                payload = orjson.loads(await download.readall())
+            extracted[index] = self._parse_analyze_result(AnalyzeResult(payload["analyzeResult"]))
+
+        async with container:
+            try:
+                await self._gather_all(
+                    [_upload(blob_name, index) for blob_name, index in blob_index.items()]
+                )
+
+                account_key = getattr(container.credential, "account_key", None)
+                if account_key:
+                    sas_token = generate_container_sas(
+                        account_name=container.account_name,
+                        container_name=container.container_name,
+                        account_key=account_key,
+                        permission=ContainerSasPermissions(read=True, write=True, list=True),
+                        expiry=datetime.now(timezone.utc)
+                        + timedelta(hours=self.storage_sas_expiry_hours),
+                    )
+                    container_url = f"{container.url}?{sas_token}"
+                else:
+                    # Connection string com SAS: a URL do container ja inclui o token.
+                    container_url = container.url
 
+                async with self._semaphore:
+                    poller = await self.doc_client.begin_analyze_batch_documents(
+                        model_id="prebuilt-document",
+                        body=AnalyzeBatchDocumentsRequest(
+                            azure_blob_source=AzureBlobContentSource(
+                                container_url=container_url, prefix=source_prefix
+                            ),
+                            result_container_url=container_url,
+                            result_prefix=result_prefix,
+                        ),
+                    )
+                    batch_result = await poller.result()
+
+                downloads = []
+                for detail in batch_result.details or []:
+                    index = blob_index.get(self._blob_name(detail.source_url))
+                    if index is None:
+                        continue
+                    if detail.status != "succeeded" or not detail.result_url:
+                        message = detail.error.message if detail.error else detail.status
+                        extracted[index] = {"error": f"Falha na analise em lote: {message}"}
+                        continue
+                    downloads.append(_download(index, detail.result_url))
+                await self._gather_all(downloads)
+            finally:
+                async for blob in container.list_blobs(name_starts_with=batch_prefix):
+                    await container.delete_blob(blob.name)
+
+        return extracted
+
+    async def _gather_all(self, coros: list) -> None:
+        """Espera todas as operacoes, mesmo com falha, antes de relancar o primeiro erro.
+
+        Assim a limpeza dos blobs so roda quando nenhum upload ou download
+        ainda esta em andamento.
+        """
+        for outcome in await asyncio.gather(*coros, return_exceptions=True):
+            if isinstance(outcome, BaseException):
+                raise outcome
+
+    def _blob_name(self, blob_url: str) -> str:
+        """Retorna o nome do blob (sem o container) a partir da URL."""
+        return unquote(urlparse(blob_url).path).split("/", 2)[2]
+
+    def _parse_analyze_result(self, result) -> dict:
+        """Converte o AnalyzeResult do Document Intelligence no formato do relatorio."""
         extracted = {
             "key_value_pairs": {},
             "tables": [],
@@ -118,82 +812,216 @@ class DocumentAnalyzer:
 
         kvp = extracted_data.get("key_value_pairs", {})
 
+        cpf_values, cnpj_values, date_values = [], [], []
+        buckets = {_CPF: cpf_values, _CNPJ: cnpj_values, _DATE: date_values}
         for key, value in kvp.items():
-            key_lower = key.lower()
-            if "cpf" in key_lower:
-                if self._validate_cpf(value):
-                    results["valid_fields"].append(f"CPF: {value}")
-                else:
-                    results["invalid_fields"].append(f"CPF invalido: {value}")
-            elif "cnpj" in key_lower:
-                if self._validate_cnpj(value):
-                    results["valid_fields"].append(f"CNPJ: {value}")
-                else:
-                    results["invalid_fields"].append(f"CNPJ invalido: {value}")
-            elif "data" in key_lower or "date" in key_lower:
-                if self._validate_date(value):
-                    results["valid_fields"].append(f"Data: {value}")
-                else:
-                    results["warnings"].append(f"Data suspeita: {value}")
+            match = _FIELD_KIND_RE.match(key)
+            if match:
+                buckets[match.lastindex].append(value)
+
+        for value, valid in zip(cpf_values, self._validate_cpf_batch(cpf_values)):
+            if valid:
+                results["valid_fields"].append(f"CPF: {value}")
+            else:
+                results["invalid_fields"].append(f"CPF invalido: {value}")
+
+        for value, valid in zip(cnpj_values, self._validate_cnpj_batch(cnpj_values)):
+            if valid:
+                results["valid_fields"].append(f"CNPJ: {value}")
+            else:
+                results["invalid_fields"].append(f"CNPJ invalido: {value}")
+
+        if date_values:
+            now = datetime.now()
+            today = (now.year, now.month, now.day)
+        for value in date_values:
+            if self._validate_date(value, today):
+                results["valid_fields"].append(f"Data: {value}")
+            else:
+                results["warnings"].append(f"Data suspeita: {value}")
 
         return results
 
+    def _only_digits(self, value: str) -> str:
+        """Remove tudo que nao for digito ASCII."""
+        digits = value.translate(_NON_DIGIT)
+        if not digits.isascii():
+            digits = "".join(c for c in digits if "0" <= c <= "9")
+        return digits
+
     def _validate_cpf(self, cpf: str) -> bool:
         """Valida numero de CPF brasileiro."""
-        cpf = "".join(filter(str.isdigit, cpf))
-        if len(cpf) != 11 or cpf == cpf[0] * 11:
+        cpf = self._only_digits(cpf)
+        if len(cpf) != 11:
             return False
 
-        for i in range(9, 11):
-            total = sum(int(cpf[j]) * ((i + 1) - j) for j in range(i))
-            digit = (total * 10 % 11) % 10
-            if int(cpf[i]) != digit:
-                return False
-        return True
+        digits = cpf.encode("ascii")
+        if digits.count(digits[0]) == 11:
+            return False
+
+        d = [b - 48 for b in digits]
+        t1 = d[0] * 10 + d[1] * 9 + d[2] * 8 + d[3] * 7 + d[4] * 6 + d[5] * 5 + d[6] * 4 + d[7] * 3 + d[8] * 2
+        t2 = d[0] * 11 + d[1] * 10 + d[2] * 9 + d[3] * 8 + d[4] * 7 + d[5] * 6 + d[6] * 5 + d[7] * 4 + d[8] * 3 + d[9] * 2
+        return d[9] == (t1 * 10 % 11) % 10 and d[10] == (t2 * 10 % 11) % 10
+
+    def _validate_cpf_batch(self, values: list[str]) -> list[bool]:
+        """Valida varios CPFs com uma unica operacao vetorizada."""
+        if len(values) <= self._BULK_THRESHOLD:
+            return [self._validate_cpf(value) for value in values]
+
+        cleaned = [self._only_digits(value) for value in values]
+        valid = [len(cpf) == 11 for cpf in cleaned]
+        rows = [cpf for cpf, ok in zip(cleaned, valid) if ok]
+        if not rows:
+            return valid
+
+        digits = np.frombuffer("".join(rows).encode("ascii"), dtype=np.uint8).reshape(-1, 11) - ord("0")
+        checks = iter(_cpf_batch_ok(digits).tolist())
+        return [ok and next(checks) for ok in valid]
 
     def _validate_cnpj(self, cnpj: str) -> bool:
         """Valida numero de CNPJ brasileiro."""
-        cnpj = "".join(filter(str.isdigit, cnpj))
+        cnpj = self._only_digits(cnpj)
         if len(cnpj) != 14:
             return False
-        return True
 
-    def _validate_date(self, date_str: str) -> bool:
+        digits = cnpj.encode("ascii")
+        if digits.count(digits[0]) == 14:
+            return False
+
+        d = [b - 48 for b in digits]
+        r1 = sum(map(mul, d, _CNPJ_W1_TUPLE)) % 11
+        r2 = sum(map(mul, d, _CNPJ_W2_TUPLE)) % 11
+        return d[12] == (0 if r1 < 2 else 11 - r1) and d[13] == (0 if r2 < 2 else 11 - r2)
+
+    def _validate_cnpj_batch(self, values: list[str]) -> list[bool]:
+        """Valida varios CNPJs com uma unica operacao vetorizada."""
+        if len(values) <= self._BULK_THRESHOLD:
+            return [self._validate_cnpj(value) for value in values]
+
+        cleaned = [self._only_digits(value) for value in values]
+        valid = [len(cnpj) == 14 for cnpj in cleaned]
+        rows = [cnpj for cnpj, ok in zip(cleaned, valid) if ok]
+        if not rows:
+            return valid
+
+        digits = np.frombuffer("".join(rows).encode("ascii"), dtype=np.uint8).reshape(-1, 14) - ord("0")
+        checks = iter(_cnpj_batch_ok(digits).tolist())
+        return [ok and next(checks) for ok in valid]
+
+    def _validate_date(self, date_str: str, today: Optional[tuple[int, int, int]] = None) -> bool:
         """Valida se a data e valida e nao esta no futuro."""
-        formats = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y"]
-        for fmt in formats:
-            try:
-                date = datetime.strptime(date_str.strip(), fmt)
-                return date <= datetime.now()
-            except ValueError:
-                continue
+        if today is None:
+            now = datetime.now()
+            today = (now.year, now.month, now.day)
+
+        match = _DATE_RE.fullmatch(date_str)
+        if not match:
+            return False
+
+        if match["y"]:
+            first, second, year = int(match["a"]), int(match["b"]), int(match["y"])
+            candidates = [(year, second, first)]
+            if match["sep"] == "/":
+                candidates.append((year, first, second))
+        else:
+            candidates = [(int(match["iso_y"]), int(match["iso_m"]), int(match["iso_d"]))]
+
+        for year, month, day in candidates:
+            if year >= 1 and 1 <= month <= 12 and 1 <= day <= _days_in_month(year, month):
+                return (year, month, day) <= today
         return False
 
-    def _analyze_fraud_patterns(self, extracted_data: dict, validation: dict) -> dict:
+    async def _analyze_fraud_patterns(self, extracted_data: dict, validation: dict) -> dict:
         """Analisa padroes de fraude usando Azure OpenAI."""
         if not self.openai_client:
             return {"analysis": "OpenAI client nao configurado", "flags": []}
 
-        prompt = f"""Analise os seguintes dados extraidos de um documento e identifique possiveis indicadores de fraude:
+        messages = self._build_fraud_messages(extracted_data, validation)
+        cache_key = self._fraud_key(self.openai_deployment, messages)
+        analysis = await self._cache_get(cache_key)
+        if analysis is None:
+            response = await self._call_openai(
+                self.openai_client.chat.completions.create,
+                model=self.openai_deployment,
+                messages=messages,
+                temperature=0.1,
+            )
+            analysis = response.choices[0].message.content
+            await self._cache_set(cache_key, analysis)
 
-Dados extraidos: {json.dumps(extracted_data.get('key_value_pairs', {}), ensure_ascii=False)}
-Validacao: {json.dumps(validation, ensure_ascii=False)}
+        return {
+            "analysis": analysis,
+            "flags": self._fraud_flags(validation),
+        }
 
-Forneca uma analise estruturada com:
-1. Indicadores de fraude encontrados
-2. Nivel de suspeita (baixo, medio, alto)
-3. Recomendacoes"""
+    def _fraud_flags(self, validation: dict) -> list[str]:
+        """Campos invalidos sinalizados pela analise de fraude; sem OpenAI nao ha analise."""
+        if not self.openai_client:
+            return []
+        return validation.get("invalid_fields", [])
+
+    @retry(
+        retry=retry_if_exception(_is_retryable_openai_error),
+        wait=_wait_retry_after,
+        stop=stop_after_attempt(6),
+        reraise=True,
+    )
+    async def _call_openai(self, method, *args, **kwargs):
+        """Chama o Azure OpenAI repetindo em 429 e falhas de conexao (retries do SDK desativados).
+
+        Cada tentativa ocupa seu proprio slot do semaforo, que fica livre
+        durante a espera do backoff.
+        """
+        async with self._semaphore:
+            return await method(*args, **kwargs)
+
+    async def _analyze_fraud_patterns_stream(self, extracted_data: dict, validation: dict):
+        """Analisa padroes de fraude usando Azure OpenAI, retornando o texto em partes."""
+        if not self.openai_client:
+            yield "OpenAI client nao configurado"
+            return
 
-        response = self.openai_client.chat.completions.create(
+        messages = self._build_fraud_messages(extracted_data, validation)
+        cache_key = self._fraud_key(self.openai_deployment, messages)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        stream = await self._call_openai(
+            self.openai_client.chat.completions.create,
             model=self.openai_deployment,
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
             temperature=0.1,
+            stream=True,
         )
+        async with self._semaphore:
+            async for chunk in stream:
+                if chunk.choices:
+                    part = chunk.choices[0].delta.content or ""
+                    parts.append(part)
+                    yield part
+        await self._cache_set(cache_key, "".join(parts))
 
-        return {
-            "analysis": response.choices[0].message.content,
-            "flags": validation.get("invalid_fields", []),
+    def _build_fraud_messages(self, extracted_data: dict, validation: dict) -> list[dict]:
+        """Monta as mensagens do prompt de analise de fraude."""
+        kvp = extracted_data.get("key_value_pairs", {})
+        compact = {
+            k: (v[:_MAX_FIELD_CHARS] if isinstance(v, str) else v) for k, v in kvp.items() if v
         }
+        compact_validation = {k: v for k, v in validation.items() if v}
+
+        prompt = (
+            f"Dados extraidos: {orjson.dumps(compact).decode()}\n"
+            f"Validacao: {orjson.dumps(compact_validation).decode()}"
+        )
+
+        return [
+            {"role": "system", "content": _FRAUD_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
 
     def _calculate_risk_score(self, validation: dict, fraud_analysis: dict) -> int:
         """Calcula score de risco de 0 a 100."""
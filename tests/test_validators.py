@@ -0,0 +1,119 @@
+"""Testes das validacoes de CPF, CNPJ e datas do DocumentAnalyzer."""
+
+import pytest
+
+from src.document_analyzer import DocumentAnalyzer
+
+TODAY = (2026, 10, 14)
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    for var in (
+        "AZURE_DOCUMENT_INTELLIGENCE_KEY",
+        "AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT",
+        "AZURE_OPENAI_KEY",
+        "AZURE_OPENAI_ENDPOINT",
+        "ANALYSIS_CACHE_DIR",
+    ):
+        monkeypatch.delenv(var, raising=False)
+    return DocumentAnalyzer()
+
+
+@pytest.mark.parametrize("cnpj", [
+    "11.222.333/0001-81",
+    "45.997.418/0001-53",
+    "11444777000161",
+    "00.000.000/0001-91",
+])
+def test_cnpj_valido(analyzer, cnpj):
+    assert analyzer._validate_cnpj(cnpj)
+
+
+@pytest.mark.parametrize("cnpj", [
+    "11.222.333/0001-82",
+    "11.222.333/0001-18",
+    "11.111.111/1111-11",
+    "11.222.333/0001-8",
+    "",
+])
+def test_cnpj_invalido(analyzer, cnpj):
+    assert not analyzer._validate_cnpj(cnpj)
+
+
+def test_cnpj_em_lote_igual_ao_escalar(analyzer):
+    values = ["11.222.333/0001-81", "11.222.333/0001-82", "11111111111111", "123"] * 20
+    assert len(values) > analyzer._BULK_THRESHOLD
+    assert analyzer._validate_cnpj_batch(values) == [analyzer._validate_cnpj(v) for v in values]
+
+
+@pytest.mark.parametrize("cpf, esperado", [
+    ("529.982.247-25", True),
+    ("52998224725", True),
+    ("529.982.247-24", False),
+    ("111.111.111-11", False),
+    ("529.982.247", False),
+])
+def test_cpf(analyzer, cpf, esperado):
+    assert analyzer._validate_cpf(cpf) is esperado
+
+
+def test_cpf_em_lote_igual_ao_escalar(analyzer):
+    values = ["529.982.247-25", "529.982.247-24", "111.111.111-11", "1"] * 20
+    assert analyzer._validate_cpf_batch(values) == [analyzer._validate_cpf(v) for v in values]
+
+
+@pytest.mark.parametrize("data, esperado", [
+    ("31/12/2020", True),
+    ("12/31/2020", True),
+    ("31-12-2020", True),
+    ("12-31-2020", False),
+    ("2020-12-31", True),
+    ("2020-13-01", False),
+    ("32/01/2020", False),
+    ("ontem", False),
+])
+def test_data_dia_mes_com_fallback_mes_dia(analyzer, data, esperado):
+    assert analyzer._validate_date(data, TODAY) is esperado
+
+
+@pytest.mark.parametrize("data, esperado", [
+    ("29/02/2024", True),
+    ("2000-02-29", True),
+    ("29/02/2023", False),
+    ("29/02/1900", False),
+    ("30/02/2024", False),
+])
+def test_data_bissexta(analyzer, data, esperado):
+    assert analyzer._validate_date(data, TODAY) is esperado
+
+
+@pytest.mark.parametrize("data, esperado", [
+    ("14/10/2026", True),
+    ("15/10/2026", False),
+    ("2027-01-01", False),
+])
+def test_data_futura(analyzer, data, esperado):
+    assert analyzer._validate_date(data, TODAY) is esperado
+
+
+def test_data_futura_sem_today(analyzer):
+    assert not analyzer._validate_date("01/01/9999")
+
+
+@pytest.mark.parametrize("chave, campo", [
+    ("CPF/CNPJ", "CPF: 529.982.247-25"),
+    ("Data CPF", "CPF: 529.982.247-25"),
+    ("cnpj_data", "CNPJ: 11.222.333/0001-81"),
+    ("Data de emissao", "Data: 01/01/2020"),
+    ("Date", "Data: 01/01/2020"),
+])
+def test_prioridade_das_chaves(analyzer, chave, campo):
+    valor = campo.split(": ", 1)[1]
+    resultado = analyzer._validate_fields({"key_value_pairs": {chave: valor}})
+    assert resultado["valid_fields"] == [campo]
+
+
+def test_chave_sem_tipo_nao_e_validada(analyzer):
+    resultado = analyzer._validate_fields({"key_value_pairs": {"Nome": "529.982.247-24"}})
+    assert resultado == {"valid_fields": [], "invalid_fields": [], "warnings": []}